@@ -1,65 +1,114 @@
 import pandas as pd
-from sklearn.decomposition import PCA
+import numpy as np
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.utils import gen_batches
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend, figures are only saved
 import matplotlib.pyplot as plt
 import argparse
+import csv
+import tempfile
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
 # Set up argument parser
 parser = argparse.ArgumentParser(description='Perform PCA analysis on gene expression data.')
 parser.add_argument('-i', '--input', required=True, help='Path to the input CSV file containing the data matrix.')
+parser.add_argument('--incremental', action='store_true', help='Use IncrementalPCA with bounded memory for matrices that do not fit in RAM.')
+parser.add_argument('--scratch-dir', default='.', help='Directory for the on-disk scratch copy used by --incremental (default: current directory, next to the outputs).')
 args = parser.parse_args()
 
-# Load the data with low_memory=False
-data = pd.read_csv(args.input, sep=',', header=None, low_memory=False)  # Explicitly set for CSV
-
-# Extract sample IDs and group information
-sample_ids = data.iloc[0, 1:].tolist()
-groups = data.iloc[1, 1:].tolist()
-
-# Extract gene expression data
-gene_names = data.iloc[2:, 0].tolist()
-expression_data = data.iloc[2:, 1:].astype(float)
-
-# Perform PCA analysis
-pca = PCA(n_components=14)  # Choose number of components
-principal_components = pca.fit_transform(expression_data.T)  # Transpose to make samples rows
-
-# Convert PCA results to a DataFrame
-pca_df = pd.DataFrame(data=principal_components, columns=[f'PC{i+1}' for i in range(14)], index=sample_ids)
+# Extract sample IDs and group information from the two metadata rows
+with open(args.input, newline='') as handle:
+    reader = csv.reader(handle)
+    sample_ids = next(reader)[1:]
+    groups = next(reader)[1:]
+
+if args.incremental:
+    # Stream the numeric block in gene chunks into a float32 scratch file (genes x samples)
+    # (kept on disk in --scratch-dir rather than TMPDIR, which is often RAM-backed)
+    with tempfile.TemporaryFile(dir=args.scratch_dir) as scratch:
+        n_genes = 0
+        for chunk in pd.read_csv(args.input, sep=',', header=None, skiprows=2, chunksize=512):
+            if chunk.shape[1] - 1 != len(sample_ids):
+                raise ValueError(f"Expression rows have {chunk.shape[1] - 1} value columns but "
+                                 f"{len(sample_ids)} sample IDs were found in the first row.")
+            chunk.iloc[:, 1:].to_numpy(dtype=np.float32).tofile(scratch)
+            n_genes += len(chunk)
+        if n_genes == 0:
+            raise ValueError("No gene expression rows found below the sample ID and group rows.")
+        scratch.flush()
+        expression_matrix = np.memmap(scratch, dtype=np.float32, mode='r', shape=(n_genes, len(sample_ids)))
+        samples_matrix = expression_matrix.T
+
+        # Fit and transform batches of samples so only one batch is held in memory at a time
+        # (the scratch file is gene-major, so each sample batch reads through the whole file)
+        pca = IncrementalPCA(n_components=14)
+        sample_batches = list(gen_batches(len(sample_ids), 512, min_batch_size=14))
+        for batch in sample_batches:
+            pca.partial_fit(np.ascontiguousarray(samples_matrix[batch]))
+        principal_components = np.vstack(
+            [pca.transform(np.ascontiguousarray(samples_matrix[batch])) for batch in sample_batches])
+        del expression_matrix, samples_matrix  # Release the mapping before the scratch file is closed
+else:
+    # Extract gene expression data, parsing the numeric block straight to float32
+    column_names = [f'c{i}' for i in range(len(sample_ids) + 1)]
+    expression_table = pacsv.read_csv(
+        args.input,
+        read_options=pacsv.ReadOptions(skip_rows=2, column_names=column_names),
+        convert_options=pacsv.ConvertOptions(
+            column_types={name: (pa.string() if name == 'c0' else pa.float32()) for name in column_names}))
+    gene_names = expression_table.column('c0').to_pylist()
+    expression_data = expression_table.select(column_names[1:]).to_pandas()
+
+    # Samples as rows, float32 and C-contiguous for the SVD (the transpose of a
+    # Fortran-ordered genes x samples array is a view, so no copy is made)
+    expression_matrix = np.asfortranarray(expression_data.to_numpy(dtype=np.float32))
+    samples_matrix = expression_matrix.T
+
+    # Perform PCA analysis (randomized SVD only factors the first few components)
+    pca = PCA(n_components=14, svd_solver='randomized', random_state=0, n_oversamples=10)  # Choose number of components
+    principal_components = pca.fit_transform(samples_matrix)
+
+evr = pca.explained_variance_ratio_
+evr100 = evr * 100  # Variance percentages, reused for the axis labels
 
 # Save PCA coordinates to a CSV file
-pca_df.to_csv('pca_coordinates.csv')
+with open('pca_coordinates.csv', 'w', newline='') as handle:
+    writer = csv.writer(handle)
+    writer.writerow(['sample_id'] + [f'PC{i+1}' for i in range(14)])
+    writer.writerows([sample_id, *row] for sample_id, row in zip(sample_ids, principal_components))
 
 # Save explained variance to a CSV file
-explained_variance = pd.DataFrame({'Principal Component': [f'PC{i+1}' for i in range(14)], 
-                                   'Explained Variance': pca.explained_variance_ratio_})
-explained_variance.to_csv('pca_variances.csv', index=False)
+with open('pca_variances.csv', 'w', newline='') as handle:
+    writer = csv.writer(handle)
+    writer.writerow(['Principal Component', 'Explained Variance'])
+    writer.writerows([f'PC{i+1}', ratio] for i, ratio in enumerate(evr))
 
 # Plotting the PCA
 plt.figure(figsize=(7, 7))
 
-# Sort groups for legend
-sorted_groups = sorted(set(groups))
-
-# Plot each group with adjusted data point size, border, and transparency
-for group in sorted_groups:
-    group_indices = [i for i, x in enumerate(groups) if x == group]
-    plt.scatter(pca_df.iloc[group_indices, 0], pca_df.iloc[group_indices, 1], 
-                label=group, 
-                s=25,                 # Size of the data points
-                edgecolor='black',    # Color of the border
-                linewidth=0.5)       # Thickness of the border (adjust as needed)
+# Encode groups once as integer codes (categories are sorted for the legend)
+group_cat = pd.Categorical(groups)
+cmap = plt.get_cmap('tab20', len(group_cat.categories))
 
-# Calculate variance percentage for PC1 and PC2
-pc1_variance = pca.explained_variance_ratio_[0] * 100
-pc2_variance = pca.explained_variance_ratio_[1] * 100
+# Plot all samples in a single call, colored by group, with adjusted data point size and border
+sc = plt.scatter(principal_components[:, 0], principal_components[:, 1],
+                 c=group_cat.codes,
+                 cmap=cmap,
+                 s=25,                 # Size of the data points
+                 edgecolor='black',    # Color of the border
+                 linewidth=0.5)       # Thickness of the border (adjust as needed)
 
 # Set axis labels with variance percentages and use Arial font
-plt.xlabel(f'PC1 ({pc1_variance:.2f}%)', fontsize=12, fontname='Arial')
-plt.ylabel(f'PC2 ({pc2_variance:.2f}%)', fontsize=12, fontname='Arial')
+plt.xlabel(f'PC1 ({evr100[0]:.2f}%)', fontsize=12, fontname='Arial')
+plt.ylabel(f'PC2 ({evr100[1]:.2f}%)', fontsize=12, fontname='Arial')
 
 
 # Move legend to the bottom left, sorted and remove the grid
-plt.legend(loc='lower left', fontsize=10, frameon=False)
+handles, _ = sc.legend_elements(prop='colors', num=None, size=5,  # size=sqrt(s) to match the points
+                                markeredgecolor='black', markeredgewidth=0.5)
+plt.legend(handles, list(group_cat.categories), loc='lower left', fontsize=10, frameon=False)
 plt.grid(False)  # Remove grid lines
 
 # Adjust border line thickness
@@ -71,4 +120,3 @@ for spine in ax.spines.values():
 ax.tick_params(axis='both', which='both', width=2)  # Set the thickness of the ticks (adjust as needed)
 
 plt.savefig('pca_plot.png')
-plt.show()
\ No newline at end of file
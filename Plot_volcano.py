@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import argparse
 import os
 
@@ -13,13 +14,19 @@ parser.add_argument("-H", "--height", type=int, default=6, help="Height of the p
 parser.add_argument("--border", type=float, default=2.5, help="Border thickness (default: 2.5)")
 parser.add_argument("--tickwidth", type=float, default=2, help="Tick width (default: 2)")
 parser.add_argument("--ticklength", type=float, default=6, help="Tick length (default: 6)")
+parser.add_argument("--interactive", action="store_true", help="Open the plot window to drag labels before saving")
 args = parser.parse_args()
 
 # Read input file
 data = pd.read_csv(args.input, index_col=0)
 
-# Compute -log10(padj)
-data["-log10(P_adj)"] = -np.log10(data["padj"])
+# Compute -log10(padj), clamping padj == 0 to the smallest positive padj so it
+# maps to a finite value on the same scale as the rest of the table
+# (falls back to the smallest positive float when no padj is positive)
+pv = data["padj"].to_numpy(np.float64)
+positive = pv > 0
+padj_floor = pv[positive].min() if positive.any() else np.finfo(np.float64).tiny
+data["-log10(P_adj)"] = -np.log10(np.clip(pv, padj_floor, None))
 
 # Drop rows with NaN values
 data = data.dropna(subset=["log2FoldChange", "-log10(P_adj)"])
@@ -28,28 +35,30 @@ data = data.dropna(subset=["log2FoldChange", "-log10(P_adj)"])
 pval_cutoff = 0.05
 logfc_cutoff = 1.0
 
-# Categorize genes
-data["Significance"] = "Not Significant"
-data.loc[(data["padj"] < pval_cutoff) & (data["log2FoldChange"] > logfc_cutoff), "Significance"] = "Upregulated"
-data.loc[(data["padj"] < pval_cutoff) & (data["log2FoldChange"] < -logfc_cutoff), "Significance"] = "Downregulated"
+# Categorize genes (codes: 0 = not significant, 1 = up, 2 = down)
+significant = data["padj"] < pval_cutoff
+sig_codes = np.select(
+    [significant & (data["log2FoldChange"] > logfc_cutoff),
+     significant & (data["log2FoldChange"] < -logfc_cutoff)],
+    [1, 2], default=0).astype(np.int8)
+data["Significance"] = pd.Categorical.from_codes(sig_codes, ["Not Significant", "Upregulated", "Downregulated"])
 
-# Define colors
-color_map = {
-    "Upregulated": "darkred",
-    "Downregulated": "darkblue",
-    "Not Significant": "#95A5A6"
-}
+# Define colors (indexed by significance code)
+color_map = np.array(["#95A5A6", "darkred", "darkblue"])
 
 # Output filename
 output_file = args.output if args.output else os.path.splitext(args.input)[0] + ".svg"
 
 # Create Matplotlib Figure
 plt.rcParams["font.family"] = "DejaVu Sans"
+plt.rcParams["path.simplify"] = True
+plt.rcParams["path.simplify_threshold"] = 1.0
+plt.rcParams["agg.path.chunksize"] = 10000
 fig, ax = plt.subplots(figsize=(args.width, args.height))
 
 # Scatter plot
 ax.scatter(data["log2FoldChange"], data["-log10(P_adj)"], 
-           c=data["Significance"].map(color_map), alpha=0.6)
+           c=color_map[sig_codes], alpha=0.6, rasterized=True)
 
 # Add threshold lines
 ax.axhline(-np.log10(pval_cutoff), color='grey', linestyle='dashed', lw=1.5, alpha=0.2)
@@ -68,31 +77,32 @@ for spine in ax.spines.values():
 ax.tick_params(axis='both', which='both', width=args.tickwidth, length=args.ticklength)
 
 # Store labels and connectors
-texts = []
-connectors = []
-
-for idx, row in data.iterrows():
-    if row["Significance"] in ["Upregulated", "Downregulated"]:
-        ha = 'right' if row["log2FoldChange"] < 0 else 'left'
-        color = 'darkred' if row["Significance"] == "Upregulated" else 'darkblue'
-
-        # Create text label
-        text = ax.text(row["log2FoldChange"], row["-log10(P_adj)"] + 0.5, 
-                       idx, fontsize=8, ha=ha, va='center', color=color)
+sig_mask = sig_codes != 0
+sig_df = data[sig_mask]
+sig_x = sig_df["log2FoldChange"].to_numpy()
+sig_y = sig_df["-log10(P_adj)"].to_numpy()
+sig_colors = color_map[sig_codes[sig_mask]]
+sig_ha = np.where(sig_x < 0, 'right', 'left')
 
-        # Create connector line
-        line, = ax.plot([row["log2FoldChange"], row["log2FoldChange"]], 
-                        [row["-log10(P_adj)"], row["-log10(P_adj)"] + 0.5], 
-                        color=color, linestyle="dashed", lw=0.8, alpha=0.6)
-
-        texts.append(text)
-        connectors.append(line)
+texts = []
+for idx, x, y, ha, color in zip(sig_df.index.to_numpy(), sig_x, sig_y, sig_ha, sig_colors):
+    # Create text label
+    text = ax.text(x, y + 0.5, idx, fontsize=8, ha=ha, va='center', color=color)
+    texts.append(text)
+
+# Create all connector lines as a single collection, shape (N, 2, 2)
+segments = np.stack([np.stack([sig_x, sig_y], axis=1),
+                     np.stack([sig_x, sig_y + 0.5], axis=1)], axis=1)
+connectors = LineCollection(segments, colors=sig_colors, linestyles="dashed", linewidths=0.8, alpha=0.6)
+ax.add_collection(connectors)
+ax.autoscale_view()  # add_collection does not rescale the axes on its own
 
 ### **Enable Dragging for Labels & Update Connectors**
 class DraggableAnnotations:
-    def __init__(self, texts, connectors, data_points):
+    def __init__(self, texts, connectors, segments, data_points):
         self.texts = texts
         self.connectors = connectors
+        self.segments = segments
         self.data_points = data_points  # Store original data locations
         self.pressed = None
         self.cidpress = fig.canvas.mpl_connect('button_press_event', self.on_press)
@@ -113,25 +123,26 @@ class DraggableAnnotations:
     def on_motion(self, event):
         if self.pressed is not None and event.xdata is not None and event.ydata is not None:
             text = self.texts[self.pressed]
-            line = self.connectors[self.pressed]
             orig_x, orig_y = self.data_points[self.pressed]  # Keep one end fixed
 
             # Move label to new position
             text.set_position((event.xdata, event.ydata))
 
             # Update connector (fixed at data point)
-            line.set_xdata([orig_x, event.xdata])
-            line.set_ydata([orig_y, event.ydata])
+            self.segments[self.pressed] = [[orig_x, orig_y], [event.xdata, event.ydata]]
+            self.connectors.set_segments(self.segments)
 
             fig.canvas.draw()
 
-# Activate draggable annotations
-data_points = list(zip(data["log2FoldChange"], data["-log10(P_adj)"]))  # Store original data positions
-dr = DraggableAnnotations(texts, connectors, data_points)
+if args.interactive:
+    # Activate draggable annotations
+    data_points = np.column_stack([sig_x, sig_y])  # Store original positions of the labeled genes
+    dr = DraggableAnnotations(texts, connectors, segments, data_points)
 
-# Show interactive Matplotlib plot
-plt.show()
+    # Show interactive Matplotlib plot
+    plt.show()
 
 # Save after interaction
-plt.savefig(output_file, format="svg", dpi=1200, bbox_inches="tight")
+fig.tight_layout()
+plt.savefig(output_file, format="svg", dpi=300)
 print(f"Plot saved as: {output_file}")
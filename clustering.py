@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 from sklearn.cluster import KMeans
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend, figures are only saved
 import matplotlib.pyplot as plt
 from matplotlib.colors import ListedColormap, BoundaryNorm
 from mpl_toolkits.mplot3d import Axes3D
@@ -34,17 +36,25 @@ if df.empty:
     raise ValueError("No valid UMAP coordinates found. Check your projection file.")
 
 # === K-Means Clustering === #
+X = np.ascontiguousarray(df[['x', 'y', 'z']].to_numpy(dtype=np.float32))  # float32, shape (n, 3)
 kmeans = KMeans(n_clusters=args.clusters, random_state=42)
-df['cluster'] = kmeans.fit_predict(df[['x', 'y', 'z']])
+df['cluster'] = kmeans.fit_predict(X).astype(np.int32)
 
 # Save clustered output
 df.to_csv("clustered_umap_3D_kmeans.csv", index=False)
 
+# Downcast coordinates to float32 for plotting (the CSV above keeps full precision)
+df[['x', 'y', 'z']] = df[['x', 'y', 'z']].astype(np.float32)
+
 # === Plotting === #
-unique_clusters = np.sort(df['cluster'].unique())
+plt.rcParams['path.simplify'] = True
+plt.rcParams['path.simplify_threshold'] = 1.0
+plt.rcParams['agg.path.chunksize'] = 10000
+
+clusters = df['cluster'].to_numpy()
+unique_clusters = np.unique(clusters)
 num_clusters = len(unique_clusters)
-cluster_map = {k: i for i, k in enumerate(unique_clusters)}
-df['cluster_index'] = df['cluster'].map(cluster_map)
+df['cluster_index'] = np.searchsorted(unique_clusters, clusters)
 
 def get_spaced_colors(n, cmap_name='nipy_spectral', min_gap=3):
     cmap = plt.get_cmap(cmap_name)
@@ -64,7 +74,8 @@ scatter = ax.scatter(
     cmap=cmap,
     norm=norm,
     s=20,
-    alpha=0.9
+    alpha=0.9,
+    rasterized=True
 )
 
 ax.view_init(elev=20, azim=135)
@@ -84,5 +95,5 @@ cbar.ax.set_yticklabels(unique_clusters.astype(str))
 cbar.ax.tick_params(labelsize=8)
 
 plt.tight_layout()
-plt.savefig("clustered_umap_3D_kmeans.png", format='png', dpi=1200, bbox_inches='tight')
+plt.savefig("clustered_umap_3D_kmeans.png", format='png', dpi=1200)
 
@@ -1,27 +1,55 @@
 import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend, figures are only saved
 import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
+from sklearn.cluster import MiniBatchKMeans
+from joblib import Parallel, delayed
+from scipy.spatial.distance import cdist
 import argparse
 
 parser = argparse.ArgumentParser()
 parser.add_argument("-i", "--input", required=True, help="Input projected_embeddings_file.csv")
 parser.add_argument("--kmin", type=int, default=2)
 parser.add_argument("--kmax", type=int, default=40)
+parser.add_argument("--warm-start", action="store_true",
+                    help="Seed each k from the k-1 centroids plus the farthest point (serial sweep)")
 args = parser.parse_args()
 
 df = pd.read_csv(args.input)
-X = df[["component_0", "component_1", "component_2"]].values
+X = np.ascontiguousarray(df[["component_0", "component_1", "component_2"]].to_numpy(dtype=np.float32))
 
-inertia = []
-k_range = range(args.kmin, args.kmax + 1)
-for k in k_range:
-    km = KMeans(n_clusters=k, n_init="auto", random_state=42)
+def fit_k(X, k, init="k-means++", n_init=3):
+    # Mini-batch inertia tracks full K-Means closely enough for the elbow curve
+    km = MiniBatchKMeans(n_clusters=k, init=init, batch_size=4096, n_init=n_init, max_iter=100, random_state=42)
     km.fit(X)
-    inertia.append(km.inertia_)
+    return km
+
+def fit_k_inertia(X, k):
+    # Only ship the inertia back from parallel workers, not the fitted labels
+    return fit_k(X, k).inertia_
+
+k_range = range(args.kmin, args.kmax + 1)
+if args.warm_start:
+    # Each k reuses the previous centroids plus the point farthest from all of them
+    inertia = []
+    prev_centers = None
+    for k in k_range:
+        if prev_centers is None:
+            km = fit_k(X, k)
+        else:
+            seed = cdist(X, prev_centers).min(axis=1).argmax()
+            init_arr = np.vstack([prev_centers, X[seed]])
+            km = fit_k(X, k, init=init_arr, n_init=1)
+        prev_centers = km.cluster_centers_
+        inertia.append(km.inertia_)
+else:
+    inertia = Parallel(n_jobs=-1, backend="loky")(delayed(fit_k_inertia)(X, k) for k in k_range)
 
 # Save CSV
 csv_out = "kmeans_elbow_values.csv"
-pd.DataFrame({"k": list(k_range), "inertia": inertia}).to_csv(csv_out, index=False)
+np.savetxt(csv_out, np.column_stack([k_range, inertia]), delimiter=",",
+           header="k,inertia", comments="", fmt=["%d", "%.10g"])
 
 # Plot
 plt.figure()